@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import traceback
+
+import parse_econpapers
+import parse_genealogy
+
+from utils import add_output_arguments, atomic_open, make_output_dir, save
+
+
+DEFAULT_SHARD_SIZE = 500
+
+CHECKPOINT_FILE = 'checkpoint.json'
+SHARDS_DIR = 'shards'
+QUARANTINE_DIR = 'quarantine'
+QUARANTINE_FILE = 'quarantine.tsv'
+
+
+def write_atomic(path, content):
+    with atomic_open(path) as f:
+        f.write(content)
+
+
+def split_shards(files, shard_size):
+    return [files[i:i + shard_size] for i in range(0, len(files), shard_size)]
+
+
+def hash_files(files):
+    files_hash = hashlib.sha256()
+    for f in files:
+        files_hash.update(f.encode('utf-8') + b'\n')
+    return files_hash.hexdigest()
+
+
+def read_checkpoint(dir_work, mode, shard_size, files):
+    path_checkpoint = os.path.join(dir_work, CHECKPOINT_FILE)
+    files_hash = hash_files(files)
+
+    if not os.path.exists(path_checkpoint):
+        return {'mode': mode,
+                'shard_size': shard_size,
+                'total_files': len(files),
+                'files_hash': files_hash,
+                'completed': [],
+                'artificial_nodes_counter': 1}
+
+    with open(path_checkpoint, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get('mode') != mode or checkpoint.get('files_hash') != files_hash \
+            or checkpoint['shard_size'] != shard_size:
+        print('Checkpoint em %s não corresponde à entrada atual (modo %s, shards de %d para %d arquivos)' % (
+            path_checkpoint, checkpoint.get('mode'), checkpoint['shard_size'], checkpoint['total_files']))
+        exit(1)
+
+    return checkpoint
+
+
+def save_checkpoint(dir_work, checkpoint):
+    write_atomic(os.path.join(dir_work, CHECKPOINT_FILE), json.dumps(checkpoint))
+
+
+def quarantine_file(dir_work, path_file):
+    dir_quarantine = os.path.join(dir_work, QUARANTINE_DIR)
+    os.makedirs(dir_quarantine, exist_ok=True)
+    shutil.copy2(path_file, dir_quarantine)
+
+
+def parse_shard(parse_function, shard, dir_work):
+    records = []
+    quarantined = []
+
+    for path_file in shard:
+        try:
+            records.append(parse_function(path_file))
+        except Exception as e:
+            print('\nFalha ao processar %s: %r' % (path_file, e))
+            traceback.print_exc()
+            quarantine_file(dir_work, path_file)
+            quarantined.append((path_file, repr(e)))
+
+    return records, quarantined
+
+
+def run_shards(files, parse_function, dir_work, shard_size, mode):
+    os.makedirs(os.path.join(dir_work, SHARDS_DIR), exist_ok=True)
+
+    files = sorted(files)
+    shards = split_shards(files, shard_size)
+    checkpoint = read_checkpoint(dir_work, mode, shard_size, files)
+    completed = set(checkpoint['completed'])
+
+    for ind, shard in enumerate(shards):
+        if ind in completed:
+            print('Shard %d of %d already done, skipping' % (ind + 1, len(shards)))
+            continue
+
+        print('Parsing shard %d of %d (%d files)' % (ind + 1, len(shards), len(shard)))
+
+        if mode == 'genealogy':
+            parse_genealogy.ARTIFICIAL_NODES_COUNTER = checkpoint['artificial_nodes_counter']
+
+        records, quarantined = parse_shard(parse_function, shard, dir_work)
+
+        path_shard = os.path.join(dir_work, SHARDS_DIR, 'shard_%05d.json' % ind)
+        write_atomic(path_shard, json.dumps({'records': records, 'quarantined': quarantined}))
+
+        if mode == 'genealogy':
+            checkpoint['artificial_nodes_counter'] = parse_genealogy.ARTIFICIAL_NODES_COUNTER
+
+        checkpoint['completed'].append(ind)
+        save_checkpoint(dir_work, checkpoint)
+
+    return len(shards)
+
+
+def read_shards(dir_work, total_shards):
+    records = []
+    quarantined = []
+
+    for ind in range(total_shards):
+        path_shard = os.path.join(dir_work, SHARDS_DIR, 'shard_%05d.json' % ind)
+        with open(path_shard, encoding='utf-8') as f:
+            shard_data = json.load(f)
+            records.extend(shard_data['records'])
+            quarantined.extend(shard_data['quarantined'])
+
+    return records, quarantined
+
+
+def save_quarantine(dir_work, quarantined):
+    lines = ['\t'.join(q) for q in quarantined]
+    write_atomic(os.path.join(dir_work, QUARANTINE_FILE), ''.join(line + '\n' for line in lines))
+
+    if quarantined:
+        print('%d files quarantined, see %s' % (len(quarantined), os.path.join(dir_work, QUARANTINE_FILE)))
+
+
+def run_genealogy(params):
+    if not os.path.isdir(params.dir_input):
+        print('Diretório %s não existe' % params.dir_input)
+        exit(1)
+
+    files = [os.path.join(params.dir_input, f) for f in os.listdir(params.dir_input)]
+    total_shards = run_shards(files, parse_genealogy.parse_file, params.dir_work, params.shard_size, 'genealogy')
+
+    records, quarantined = read_shards(params.dir_work, total_shards)
+    save_quarantine(params.dir_work, quarantined)
+
+    raw_graph = {author_code: author_data for author_code, author_data in records}
+    nodes, edges = parse_genealogy.get_normalized_nodes_edges(raw_graph, params.file_institutions_cache,
+                                                              params.file_institutions_aliases)
+
+    dir_output = make_output_dir(params.dir_output, params.per_run)
+    save(nodes, os.path.join(dir_output, 'nodes.tsv'), schema='nodes')
+    save(edges, os.path.join(dir_output, 'edges.tsv'), schema='edges')
+
+
+def run_econpapers(params):
+    dir_econpapers = os.path.join(params.dir_input, 'econpapers')
+    dir_citing_docs = os.path.join(params.dir_input, 'citing_docs')
+
+    if not os.path.exists(dir_econpapers):
+        print('Caminho %s não existe' % dir_econpapers)
+        exit(1)
+
+    parse_econpapers.load_citing_docs(dir_citing_docs)
+
+    files = [os.path.join(dir_econpapers, f) for f in os.listdir(dir_econpapers)]
+    total_shards = run_shards(files, parse_econpapers.parse_file, params.dir_work, params.shard_size, 'econpapers')
+
+    records, quarantined = read_shards(params.dir_work, total_shards)
+    save_quarantine(params.dir_work, quarantined)
+
+    econpapers = []
+    for pf in records:
+        econpapers.extend(pf)
+
+    dir_output = make_output_dir(params.dir_output, params.per_run)
+    parse_econpapers.save(econpapers, compact=params.compact, dir_output=dir_output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'mode',
+        choices=['genealogy', 'econpapers'],
+        help='Tipo de páginas a processar'
+    )
+    parser.add_argument(
+        '-d',
+        required=True,
+        dest='dir_input',
+        help='Diretório com as páginas (genealogy) ou com as pastas econpapers e citing_docs (econpapers)'
+    )
+    parser.add_argument(
+        '-w',
+        required=True,
+        dest='dir_work',
+        help='Diretório de trabalho onde ficam os shards, o checkpoint e os arquivos em quarentena'
+    )
+    parser.add_argument(
+        '-s',
+        type=int,
+        default=DEFAULT_SHARD_SIZE,
+        dest='shard_size',
+        help='Quantidade de arquivos por shard'
+    )
+    parser.add_argument(
+        '-c',
+        dest='compact',
+        action='store_true',
+        help='Grava os anos dos documentos citantes como histogramas (apenas econpapers)'
+    )
+    parser.add_argument(
+        '-m',
+        dest='file_institutions_cache',
+        help='Arquivo JSON com o mapeamento canônico de instituições (apenas genealogy)'
+    )
+    parser.add_argument(
+        '-a',
+        dest='file_institutions_aliases',
+        help='Arquivo com variantes de nomes de instituições e seus nomes canônicos (apenas genealogy)'
+    )
+    add_output_arguments(parser)
+
+    params = parser.parse_args(argv)
+
+    if params.mode == 'genealogy':
+        run_genealogy(params)
+    elif params.mode == 'econpapers':
+        run_econpapers(params)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+
+from contextlib import redirect_stderr, redirect_stdout
+
+
+COMMANDS = {
+    'genealogy': 'parse_genealogy',
+    'econpapers': 'parse_econpapers',
+    'ideas': 'parse_ideas',
+    'subgraph': 'subgraph',
+    'export': 'export',
+    'batch': 'batch',
+}
+
+DEFAULT_SOCKET = '/tmp/repec-parser.sock'
+EXIT_MARKER = '\x00exit:'
+
+
+def run_command(command, argv):
+    module = importlib.import_module(COMMANDS[command])
+
+    try:
+        module.main(argv)
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+
+    return 0
+
+
+class InteractiveInputError(Exception):
+    pass
+
+
+class NonInteractiveStdin(io.TextIOBase):
+
+    def readable(self):
+        return True
+
+    def readline(self, size=-1):
+        raise InteractiveInputError('o comando pediu uma resposta interativa, o que não é suportado no modo '
+                                    'servidor; execute-o diretamente, sem -s')
+
+    read = readline
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        job = json.loads(line.decode('utf-8'))
+        out = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        cwd = os.getcwd()
+        stdin = sys.stdin
+        sys.stdin = NonInteractiveStdin()
+
+        try:
+            with redirect_stdout(out), redirect_stderr(out):
+                try:
+                    os.chdir(job['cwd'])
+                    code = run_command(job['command'], job['argv'])
+                except InteractiveInputError as e:
+                    print('\nErro: %s' % e)
+                    code = 1
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+            out.write('%s%d\n' % (EXIT_MARKER, code))
+        finally:
+            sys.stdin = stdin
+            os.chdir(cwd)
+            out.detach()
+
+
+def is_server_listening(path_socket):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path_socket)
+        except OSError:
+            return False
+    return True
+
+
+def serve(path_socket):
+    if os.path.exists(path_socket):
+        if is_server_listening(path_socket):
+            print('Já existe um servidor atendendo em %s' % path_socket)
+            sys.exit(1)
+        os.remove(path_socket)
+
+    for module in set(COMMANDS.values()):
+        importlib.import_module(module)
+
+    with socketserver.UnixStreamServer(path_socket, JobHandler) as server:
+        print('Listening on %s' % path_socket)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path_socket)
+
+
+def send(path_socket, command, argv):
+    job = {'cwd': os.getcwd(), 'command': command, 'argv': argv}
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(path_socket)
+        s.sendall((json.dumps(job) + '\n').encode('utf-8'))
+
+        with s.makefile('r', encoding='utf-8', newline='') as f:
+            for line in f:
+                if line.startswith(EXIT_MARKER):
+                    return int(line[len(EXIT_MARKER):])
+                sys.stdout.write(line)
+
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-s',
+        dest='socket',
+        help='Envia o comando para um servidor (ver "serve") em vez de executá-lo neste processo'
+    )
+    parser.add_argument(
+        'command',
+        choices=sorted(COMMANDS) + ['serve'],
+        help='Comando a executar; "serve" inicia um servidor que atende comandos via socket local'
+    )
+    parser.add_argument(
+        'args',
+        nargs=argparse.REMAINDER,
+        help='Argumentos repassados ao comando'
+    )
+    params = parser.parse_args(argv)
+
+    if params.command == 'serve':
+        serve(params.socket or DEFAULT_SOCKET)
+    elif params.socket:
+        sys.exit(send(params.socket, params.command, params.args))
+    else:
+        sys.exit(run_command(params.command, params.args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import argparse
+import shutil
+import struct
+import tempfile
+
+from contextlib import nullcontext
+from xml.sax.saxutils import escape, quoteattr
+
+from utils import atomic_open, read_edges, MappedNodes
+
+
+DELIMITER = '\t'
+
+GEXF_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+              '<gexf xmlns="http://www.gexf.net/1.2draft" version="1.2">\n' \
+              '  <graph mode="dynamic" defaultedgetype="directed" timeformat="double">\n' \
+              '    <attributes class="edge" mode="static">\n' \
+              '      <attribute id="institution" title="Institution" type="string"/>\n' \
+              '    </attributes>\n'
+GEXF_FOOTER = '  </graph>\n' \
+              '</gexf>\n'
+
+GRAPHML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n' \
+                 '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n' \
+                 '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n' \
+                 '  <key id="start" for="node" attr.name="start" attr.type="int"/>\n' \
+                 '  <key id="year" for="edge" attr.name="year" attr.type="int"/>\n' \
+                 '  <key id="institution" for="edge" attr.name="institution" attr.type="string"/>\n' \
+                 '  <graph edgedefault="directed">\n'
+GRAPHML_FOOTER = '  </graph>\n' \
+                 '</graphml>\n'
+
+BINARY_MAGIC = b'REPECEL1'
+BINARY_EDGE = struct.Struct('<IIIH')
+
+
+def _year_to_int(year):
+    if year and year.isdigit():
+        return int(year)
+    return 0
+
+
+def _iter_unique_edges(edges):
+    seen = set()
+    for e in edges:
+        s, t, y, i = e
+        if (s, t, y) not in seen:
+            seen.add((s, t, y))
+            yield s, t, y, i or ''
+
+
+def _update_start(nodes_start, code, year):
+    if code not in nodes_start or (year and (not nodes_start[code] or year < nodes_start[code])):
+        nodes_start[code] = year
+
+
+def _stream_xml(edges, path, header, separator, footer, node_to_xml, edge_to_xml):
+    nodes_start = {}
+
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as f_edges:
+        for ind, (s, t, y, i) in enumerate(_iter_unique_edges(edges)):
+            year = _year_to_int(y)
+            _update_start(nodes_start, s, year)
+            _update_start(nodes_start, t, year)
+            f_edges.write(edge_to_xml(ind, s, t, year, i))
+
+        f_edges.seek(0)
+
+        with atomic_open(path) as f:
+            f.write(header)
+            node_lines = (node_to_xml(code, start) for code, start in nodes_start.items())
+            f.writelines(node_lines)
+            f.write(separator)
+            shutil.copyfileobj(f_edges, f)
+            f.write(footer)
+
+
+def write_gexf(nodes, edges, path):
+    def node_to_xml(code, start):
+        start_attr = ' start="%d"' % start if start else ''
+        return '      <node id=%s label=%s%s/>\n' % (quoteattr(code), quoteattr(nodes.get(code, '') or ''), start_attr)
+
+    def edge_to_xml(ind, s, t, year, institution):
+        start_attr = ' start="%d"' % year if year else ''
+        return '      <edge id="%d" source=%s target=%s%s>' \
+               '<attvalues><attvalue for="institution" value=%s/></attvalues></edge>\n' % (
+                   ind, quoteattr(s), quoteattr(t), start_attr, quoteattr(institution))
+
+    _stream_xml(edges, path, GEXF_HEADER + '    <nodes>\n', '    </nodes>\n    <edges>\n', '    </edges>\n' + GEXF_FOOTER,
+                node_to_xml, edge_to_xml)
+
+
+def write_graphml(nodes, edges, path):
+    def node_to_xml(code, start):
+        start_data = '<data key="start">%d</data>' % start if start else ''
+        return '    <node id=%s><data key="label">%s</data>%s</node>\n' % (
+            quoteattr(code), escape(nodes.get(code, '') or ''), start_data)
+
+    def edge_to_xml(ind, s, t, year, institution):
+        year_data = '<data key="year">%d</data>' % year if year else ''
+        return '    <edge id="e%d" source=%s target=%s>%s<data key="institution">%s</data></edge>\n' % (
+            ind, quoteattr(s), quoteattr(t), year_data, escape(institution))
+
+    _stream_xml(edges, path, GRAPHML_HEADER, '', GRAPHML_FOOTER, node_to_xml, edge_to_xml)
+
+
+def write_binary(nodes, edges, path):
+    node_to_id = {}
+    institution_to_id = {}
+
+    with atomic_open(path, 'wb') as f:
+        f.write(BINARY_MAGIC)
+
+        for s, t, y, i in _iter_unique_edges(edges):
+            s_id = node_to_id.setdefault(s, len(node_to_id))
+            t_id = node_to_id.setdefault(t, len(node_to_id))
+            i_id = institution_to_id.setdefault(i, len(institution_to_id))
+            f.write(BINARY_EDGE.pack(s_id, t_id, i_id, _year_to_int(y)))
+
+    with atomic_open(path + '.nodes.tsv') as f:
+        for code in node_to_id:
+            f.write('\t'.join([code, nodes.get(code, '') or '']) + '\n')
+
+    with atomic_open(path + '.institutions.tsv') as f:
+        for institution in institution_to_id:
+            f.write(institution + '\n')
+
+
+def read_binary(path):
+    with open(path + '.nodes.tsv', encoding='utf-8') as f:
+        codes = [line.rstrip('\n').split('\t')[0] for line in f]
+
+    with open(path + '.institutions.tsv', encoding='utf-8') as f:
+        institutions = [line.rstrip('\n') for line in f]
+
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if not data.startswith(BINARY_MAGIC):
+        raise ValueError('%s não é uma lista de arestas binária' % path)
+
+    edges = []
+    for s_id, t_id, i_id, year in BINARY_EDGE.iter_unpack(data[len(BINARY_MAGIC):]):
+        edges.append((codes[s_id], codes[t_id], str(year) if year else '', institutions[i_id]))
+
+    return edges
+
+
+WRITERS = {
+    'gexf': write_gexf,
+    'graphml': write_graphml,
+    'binary': write_binary,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n',
+        dest='file_nodes',
+        help='Arquivo em que cada linha deve conter o código do vértice e seu '
+             'respectivo nome.'
+    )
+    parser.add_argument(
+        '-e',
+        dest='file_edges',
+        required=True,
+        help='Arquivo em que cada linha deve conter o código do vértice origem e o código '
+             'do vértice de destino.'
+    )
+    parser.add_argument(
+        '-f',
+        dest='format',
+        choices=sorted(WRITERS),
+        default='gexf',
+        help='Formato de saída: GEXF dinâmico, GraphML ou lista de arestas binária.'
+    )
+    parser.add_argument(
+        '-o',
+        dest='file_output',
+        required=True,
+        help='Arquivo de saída.'
+    )
+    params = parser.parse_args(argv)
+
+    if params.file_nodes:
+        nodes_context = MappedNodes(params.file_nodes, delimiter=DELIMITER)
+    else:
+        nodes_context = nullcontext({})
+
+    with nodes_context as nodes:
+        print('Reading edges')
+        edges = read_edges(params.file_edges, delimiter=DELIMITER)
+
+        print('Writing %s' % params.file_output)
+        WRITERS[params.format](nodes, edges, params.file_output)
+    print('Done')
+
+
+if __name__ == '__main__':
+    main()
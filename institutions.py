@@ -0,0 +1,102 @@
+import json
+import os
+import re
+import unicodedata
+
+from utils import atomic_open
+
+
+REGEX_NON_WORD = r'[\W_]+'
+
+HANDLE_KEY_PREFIX = 'handle:'
+NAME_KEY_PREFIX = 'name:'
+
+
+def normalize_institution_name(name):
+    name = unicodedata.normalize('NFKD', name.casefold())
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return re.sub(REGEX_NON_WORD, ' ', name).strip()
+
+
+def read_aliases(path_file_aliases):
+    aliases = {}
+
+    with open(path_file_aliases, encoding='utf-8') as f:
+        for line in f:
+            els = line.rstrip('\n').split('\t')
+            if len(els) < 2 or not els[0].strip():
+                continue
+
+            alias, canonical = els[0], els[1]
+            aliases[normalize_institution_name(alias)] = ' '.join(canonical.split())
+
+    return aliases
+
+
+class InstitutionRegistry:
+
+    def __init__(self, aliases=None):
+        self.aliases = aliases or {}
+        self.keys = {}
+        self.labels = []
+
+    def _name_key_and_label(self, name):
+        label = ' '.join(name.split())
+        normalized = normalize_institution_name(label)
+
+        if normalized in self.aliases:
+            label = self.aliases[normalized]
+            normalized = normalize_institution_name(label)
+
+        return NAME_KEY_PREFIX + normalized, label
+
+    def intern(self, name, handle=''):
+        label = handle
+
+        if normalize_institution_name(name):
+            name_key, label = self._name_key_and_label(name)
+        elif not handle:
+            return None
+
+        # a handle EDIRC identifica a instituição; o nome só é chave quando o link não tem handle
+        key = HANDLE_KEY_PREFIX + handle if handle else name_key
+
+        if key not in self.keys:
+            self.keys[key] = len(self.labels)
+            self.labels.append(label)
+
+        return self.keys[key]
+
+    def label(self, inst_id):
+        if inst_id is None:
+            return ''
+        return self.labels[inst_id]
+
+    def canonicalize(self, name, handle=''):
+        return self.label(self.intern(name, handle))
+
+    def load(self, path_file_cache):
+        with open(path_file_cache, encoding='utf-8') as f:
+            cache = json.load(f)
+
+        self.keys = cache['keys']
+        self.labels = cache['labels']
+
+    def save(self, path_file_cache):
+        with atomic_open(path_file_cache) as f:
+            json.dump({'keys': self.keys, 'labels': self.labels}, f, ensure_ascii=False)
+
+
+def load_registry(path_file_cache=None, path_file_aliases=None):
+    if not path_file_cache and not path_file_aliases:
+        return None
+
+    aliases = {}
+    if path_file_aliases:
+        aliases = read_aliases(path_file_aliases)
+
+    registry = InstitutionRegistry(aliases)
+    if path_file_cache and os.path.exists(path_file_cache):
+        registry.load(path_file_cache)
+
+    return registry
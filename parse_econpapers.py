@@ -3,12 +3,18 @@ import bs4
 import os
 import re
 
+from collections import Counter
+
+from utils import add_output_arguments, atomic_open, make_output_dir
+
 
 REGEX_TOTAL_CITATIONS = r'.*View citations \((.*)\)'
 REGEX_CITING_DOCS_URL = r'.*scripts/showcites.pf\?h=(.*)'
 REGEX_CITING_DOC_YEAR = r'(\d{4})|$'
 CITING_DOCS = {}
 
+UNKNOWN_CITING_YEAR = 0
+
 
 def _extract_author_code(path_file):
     head, tail = os.path.split(path_file)
@@ -109,7 +115,7 @@ def _extract_article_journal(li):
 def _extract_article_citations_info(li):
     total_citations = _extract_total_citations(li)
     citing_documents_info = _extract_citing_documents_info(li)
-    return (total_citations, '#'.join(citing_documents_info))
+    return (total_citations, citing_documents_info)
 
 
 def _extract_total_citations(li):
@@ -165,6 +171,45 @@ def _find_citing_document_year(citing_document_li):
     return ''
 
 
+def count_citing_years(citing_years):
+    histogram = Counter()
+
+    for y in citing_years:
+        if y.isdigit():
+            histogram[int(y)] += 1
+        else:
+            histogram[UNKNOWN_CITING_YEAR] += 1
+
+    return histogram
+
+
+def expand_citing_years(histogram):
+    citing_years = []
+
+    for y in sorted(histogram):
+        if y == UNKNOWN_CITING_YEAR:
+            citing_years.extend([''] * histogram[y])
+        else:
+            citing_years.extend([str(y)] * histogram[y])
+
+    return citing_years
+
+
+def read_citation_histograms(path_file):
+    histograms = {}
+
+    with open(path_file) as f:
+        for line in f:
+            a_code, art_code, year, count = line.rstrip('\n').split('|')
+            key = (a_code, art_code)
+
+            if key not in histograms:
+                histograms[key] = Counter()
+            histograms[key][int(year)] += int(count)
+
+    return histograms
+
+
 def parse_file(path_file):
     parsed_data = []
 
@@ -180,26 +225,64 @@ def parse_file(path_file):
     return parsed_data
 
 
-def save(data):
-    with open('biblio_econpapers.csv', 'w') as f:
+def load_citing_docs(dir_citing_docs):
+    CITING_DOCS.clear()
+    for f in os.listdir(dir_citing_docs):
+        CITING_DOCS[f.replace('_', '/').replace('.html', '')] = os.path.join(dir_citing_docs, f)
+
+
+def save(data, compact=False, dir_output='.'):
+    with atomic_open(os.path.join(dir_output, 'biblio_econpapers.csv')) as f:
         for d in data:
             a_code, a_name, ajps = d
             for year, arts in ajps.items():
                 for art in arts:
                     code, title, journal, citations_total, citations_years = art
+
+                    if compact:
+                        citations_years = ''
+                    else:
+                        citations_years = '#'.join(citations_years)
+
                     line = '|'.join(str(x).strip() for x in [a_code, a_name, year, code, title, journal, citations_total, citations_years])
                     f.write(line + '\n')
 
+    if compact:
+        save_citation_histograms(data, dir_output)
 
-def main():
+
+def save_citation_histograms(data, dir_output='.'):
+    with atomic_open(os.path.join(dir_output, 'citations_econpapers.csv')) as f:
+        for d in data:
+            a_code, a_name, ajps = d
+            for year, arts in ajps.items():
+                for art in arts:
+                    code = art[0]
+                    citations_years = art[-1]
+
+                    histogram = count_citing_years(citations_years)
+                    for cy in sorted(histogram):
+                        line = '|'.join(str(x).strip() for x in [a_code, code, cy, histogram[cy]])
+                        f.write(line + '\n')
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '-d',
         required=True,
         dest='dir_raw'
     )
+    parser.add_argument(
+        '-c',
+        dest='compact',
+        action='store_true',
+        help='Grava os anos dos documentos citantes como histogramas (ano|contagem) '
+             'em citations_econpapers.csv, em vez de listas separadas por #'
+    )
+    add_output_arguments(parser)
 
-    params = parser.parse_args()
+    params = parser.parse_args(argv)
 
     dir_econpapers = os.path.join(params.dir_raw, 'econpapers')
     dir_citing_docs = os.path.join(params.dir_raw, 'citing_docs')
@@ -210,9 +293,7 @@ def main():
 
     files_econpapers = [os.path.join(dir_econpapers, f) for f in os.listdir(dir_econpapers)]
 
-    global CITING_DOCS
-    for f in os.listdir(dir_citing_docs):
-        CITING_DOCS[f.replace('_', '/').replace('.html', '')] = os.path.join(dir_citing_docs, f)
+    load_citing_docs(dir_citing_docs)
 
     econpapers = []
     total_files = len(files_econpapers)
@@ -223,7 +304,8 @@ def main():
         if pf:
             econpapers.extend(pf)
 
-    save(econpapers)
+    dir_output = make_output_dir(params.dir_output, params.per_run)
+    save(econpapers, compact=params.compact, dir_output=dir_output)
 
 
 if __name__ == '__main__':
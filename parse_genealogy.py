@@ -3,17 +3,19 @@ import bs4
 import os
 import re
 
-from utils import save
+from institutions import load_registry
+from utils import add_output_arguments, make_output_dir, save
 
 
 REGEX_YEAR = r'\d{4}'
 REGEX_STUDENT_NAME = r'\d{4}(.*)\('
 REGEX_CODE = r'\/(\w*)\.html'
+REGEX_INSTITUTION_HANDLE = r'\/data\/(\w*)\.html'
 
 ARTIFICIAL_NODES_COUNTER = 1
 
 
-def get_cleaned_nodes_edges(raw):
+def get_cleaned_nodes_edges(raw, institutions=None):
     nodes = []
     edges = []
 
@@ -29,10 +31,18 @@ def get_cleaned_nodes_edges(raw):
                 formation_institution = v.get('graduate_info')[0][0]
                 formation_year = v.get('graduate_info')[0][-1]
 
+                if institutions is not None:
+                    formation_institution = institutions.canonicalize(formation_institution,
+                                                                      v.get('graduate_info')[0][1])
+
                 edges.append('\t'.join([advisor_code, profile_researcher_code, formation_year, formation_institution, 'padv']))
 
         for vi in v.get('students', []):
-            stu_code, stu_name, stu_year, stu_institution = vi
+            stu_code, stu_name, stu_year, stu_institution, stu_institution_handle = vi
+
+            if institutions is not None:
+                stu_institution = institutions.canonicalize(stu_institution, stu_institution_handle)
+
             edges.append('\t'.join([profile_researcher_code, stu_code, stu_year, stu_institution, 'pstu']))
 
     print('cleaning and deduplicating edges...')
@@ -41,6 +51,17 @@ def get_cleaned_nodes_edges(raw):
     return nodes, edges
 
 
+def get_normalized_nodes_edges(raw, file_institutions_cache=None, file_institutions_aliases=None):
+    institutions = load_registry(file_institutions_cache, file_institutions_aliases)
+
+    nodes, edges = get_cleaned_nodes_edges(raw, institutions)
+
+    if file_institutions_cache:
+        institutions.save(file_institutions_cache)
+
+    return nodes, edges
+
+
 def generate_artificial_code(mode: str):
     global ARTIFICIAL_NODES_COUNTER
 
@@ -58,10 +79,12 @@ def _extract_graduate_info(raw):
     gras = []
 
     institution_name = ''
+    institution_handle = ''
     year = ''
 
     if raw.name == 'a':
         institution_name = raw.text
+        institution_handle = _extract_institution_handle(raw.get('href', ''))
 
     possible_year = raw.next_sibling
     if isinstance(possible_year, str):
@@ -70,7 +93,7 @@ def _extract_graduate_info(raw):
             year = matched_year.group()
 
     if institution_name or year:
-        gras.append((institution_name, year))
+        gras.append((institution_name, institution_handle, year))
 
     return gras
 
@@ -79,14 +102,14 @@ def _extract_students(raw):
     stus = []
 
     for c in raw.children:
-        stu_institution = _find_institution(c.next)
+        stu_institution, stu_institution_handle = _find_institution(c.next)
         for li in c.find_all('li'):
             stu_year, stu_name, stu_code = _find_student_data(li)
 
             if stu_code == '-1':
                 stu_code = generate_artificial_code('student')
 
-            stus.append((stu_code, stu_name, stu_year, stu_institution))
+            stus.append((stu_code, stu_name, stu_year, stu_institution, stu_institution_handle))
 
         return stus
 
@@ -130,12 +153,21 @@ def _find_student_data(li):
 
 def _find_institution(tag):
     inst = ''
+    handle = ''
 
     if isinstance(tag, bs4.element.Tag):
         if tag.name == 'a':
             if 'data' in tag.get('href', ''):
                 inst = tag.text
-    return inst
+                handle = _extract_institution_handle(tag.get('href'))
+    return inst, handle
+
+
+def _extract_institution_handle(href):
+    matched_handle = re.search(REGEX_INSTITUTION_HANDLE, href)
+    if matched_handle:
+        return matched_handle.group(1)
+    return ''
 
 
 def _extract_advisors(raw):
@@ -190,6 +222,33 @@ def deduplicate_edges(edges: list):
     return sorted(ddp_edges)
 
 
+def parse_file(path_file):
+    with open(path_file, encoding='utf-8') as fr:
+        fr_soup = bs4.BeautifulSoup(fr, 'html.parser')
+
+        author_name = _extract_author_name(fr_soup.find('h1').text)
+        author_code = _extract_author_code(os.path.basename(path_file))
+
+        graduate_info = []
+        advisors = []
+        students = []
+
+        related = fr_soup.find_all('h2')
+
+        for rel in related:
+            if rel.text == 'Graduate studies':
+                graduate_info = _extract_graduate_info(rel.find_next())
+            elif rel.text == 'Advisor':
+                advisors = _extract_advisors(rel.find_next())
+            elif rel.text == 'Students':
+                students = _extract_students(rel.find_next()) or []
+
+    return author_code, {'name': author_name,
+                         'advisors': advisors,
+                         'graduate_info': graduate_info,
+                         'students': students}
+
+
 def parse_files(path):
     raw_graph = {}
 
@@ -197,31 +256,13 @@ def parse_files(path):
     total = len(files)
     for ind, fi in enumerate(files):
         print('\rParsing %d of %d... ' % (ind, total), end='')
-        with open(os.path.join(path, fi), encoding='utf-8') as fr:
-            fr_soup = bs4.BeautifulSoup(fr, 'html.parser')
-
-            author_name = _extract_author_name(fr_soup.find('h1').text)
-            author_code = _extract_author_code(fi)
-
-            related = fr_soup.find_all('h2')
-
-            for rel in related:
-                if rel.text == 'Graduate studies':
-                    graduate_info = _extract_graduate_info(rel.find_next())
-                elif rel.text == 'Advisor':
-                    advisors = _extract_advisors(rel.find_next())
-                elif rel.text == 'Students':
-                    students = _extract_students(rel.find_next())
-
-            raw_graph[author_code] = {'name': author_name,
-                                      'advisors': advisors,
-                                      'graduate_info': graduate_info,
-                                      'students': students}
+        author_code, author_data = parse_file(os.path.join(path, fi))
+        raw_graph[author_code] = author_data
     print('Done')
     return raw_graph
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
@@ -229,17 +270,33 @@ def main():
         dest='dir_genealogy',
         help='Diretório com páginas de genealogia'
     )
+    parser.add_argument(
+        '-m',
+        dest='file_institutions_cache',
+        help='Arquivo JSON com o mapeamento canônico de instituições, lido e atualizado a cada execução'
+    )
+    parser.add_argument(
+        '-a',
+        dest='file_institutions_aliases',
+        help='Arquivo em que cada linha contém uma variante do nome de uma instituição e seu nome canônico'
+    )
+    add_output_arguments(parser)
 
-    params = parser.parse_args()
+    params = parser.parse_args(argv)
 
-    if not os.path.isdir(params):
+    if not os.path.isdir(params.dir_genealogy):
         print('Diretório %s não existe' % params.dir_genealogy)
         exit(1)
 
+    global ARTIFICIAL_NODES_COUNTER
+    ARTIFICIAL_NODES_COUNTER = 1
+
     initial_graph = parse_files(params.dir_genealogy)
-    nodes, edges = get_cleaned_nodes_edges(initial_graph)
-    save(nodes, 'nodes.tsv')
-    save(edges, 'edges.tsv')
+    nodes, edges = get_normalized_nodes_edges(initial_graph, params.file_institutions_cache,
+                                              params.file_institutions_aliases)
+    dir_output = make_output_dir(params.dir_output, params.per_run)
+    save(nodes, os.path.join(dir_output, 'nodes.tsv'), schema='nodes')
+    save(edges, os.path.join(dir_output, 'edges.tsv'), schema='edges')
 
 
 if __name__ == '__main__':
@@ -5,6 +5,8 @@ import os
 import re
 import sys
 
+from utils import add_output_arguments, make_output_dir, save
+
 
 REGEX_YEAR = r'\d{4}'
 REGEX_STUDENT_NAME = r'\d{4}(.*)\('
@@ -13,17 +15,6 @@ REGEX_CODE = r'\/(\w*)\.html'
 ARTIFICIAL_NODES_COUNTER = 1
 
 
-def save(data, path):
-    with open(path, 'w') as f:
-        if 'nodes' in path:
-            f.write('Id\tLabel\n')
-        elif 'edges' in path:
-            f.write('Source\tTarget\tYear\tInstitution\n')
-
-        for d in data:
-            f.write(d + '\n')
-
-
 def get_cleaned_nodes_edges(raw):
     nodes = []
     edges = []
@@ -212,14 +203,15 @@ def parse_file(path_file):
     return parsed_data
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '-d',
         required=True,
         dest='dir_ideas'
     )
-    params = parser.parse_args()
+    add_output_arguments(parser)
+    params = parser.parse_args(argv)
 
     if not os.path.exists(params.dir_ideas):
         print('Caminho %s não existe' % params.dir_ideas)
@@ -234,7 +226,8 @@ def main():
             if pf:
                 ideas.append(pf)
 
-    save(ideas, 'biblio_ideas.tsv')
+    dir_output = make_output_dir(params.dir_output, params.per_run)
+    save(ideas, os.path.join(dir_output, 'biblio_ideas.tsv'))
 
 
 if __name__ == '__main__':
@@ -1,10 +1,16 @@
 import argparse
+import os
 
-from utils import read_nodes, read_edges, split_edges, save
+from contextlib import nullcontext
+
+from utils import read_edges, read_rows, split_edges, save, filter_edges_by_seeds, MappedNodes, add_output_arguments, \
+    make_output_dir, group_edges_by_year
 
 
 DELIMITER = '\t'
 
+DELTA_MANIFEST_FILE = 'deltas_manifest.txt'
+
 
 def decide_edge_merge(key, old_inst, new_inst):
     if old_inst == '' and new_inst != '':
@@ -23,7 +29,7 @@ def decide_edge_merge(key, old_inst, new_inst):
         return new_inst
 
 
-def read_data():
+def read_data(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
         '-n',
@@ -38,21 +44,140 @@ def read_data():
         help='Arquivo em que cada linha deve conter o código do vértice origem e o código '
              'do vértice de destino.'
     )
-    params = parser.parse_args()
+    parser.add_argument(
+        '--from-year',
+        type=int,
+        dest='from_year',
+        help='Grava apenas subgrafos de anos maiores ou iguais a este; arestas anteriores continuam '
+             'incluídas nos subgrafos cumulativos.'
+    )
+    parser.add_argument(
+        '--to-year',
+        type=int,
+        dest='to_year',
+        help='Considera apenas arestas com ano menor ou igual a este.'
+    )
+    parser.add_argument(
+        '-i',
+        dest='institutions',
+        action='append',
+        help='Considera apenas arestas desta instituição (pode ser repetido).'
+    )
+    parser.add_argument(
+        '-s',
+        dest='seeds',
+        action='append',
+        help='Código de vértice semente; mantém apenas vértices a até --radius saltos '
+             'das sementes (pode ser repetido).'
+    )
+    parser.add_argument(
+        '--radius',
+        type=int,
+        default=1,
+        dest='radius',
+        help='Quantidade de saltos a partir das sementes.'
+    )
+    parser.add_argument(
+        '--delta',
+        dest='delta',
+        action='store_true',
+        help='Grava, para cada ano, apenas os vértices e arestas adicionados e os conflitos de '
+             'instituição resolvidos naquele ano (mantém a primeira), em vez de subgrafos cumulativos.'
+    )
+    add_output_arguments(parser)
+    params = parser.parse_args(argv)
 
-    if params.file_nodes:
-        nodes = read_nodes(params.file_nodes, delimiter=DELIMITER)
-    else:
-        nodes = {}
+    year_range = None
+    if params.to_year is not None:
+        year_range = (None, params.to_year)
 
-    edges = read_edges(params.file_edges, delimiter=DELIMITER)
+    institutions = None
+    if params.institutions:
+        institutions = set(params.institutions)
 
-    return nodes, edges
+    edges = read_edges(params.file_edges, delimiter=DELIMITER, year_range=year_range, institutions=institutions)
 
+    if params.seeds:
+        edges = filter_edges_by_seeds(edges, set(params.seeds), params.radius)
 
-if __name__ == '__main__':
-    print('Reading nodes and edges')
-    nodes, edges = read_data()
+    return edges, params
+
+
+def save_deltas(nodes, edges, dir_output, from_year=None):
+    path_manifest = os.path.join(dir_output, DELTA_MANIFEST_FILE)
+    if os.path.exists(path_manifest):
+        os.remove(path_manifest)
+
+    year_to_edges = group_edges_by_year(edges)
+    d_years = []
+
+    seen_nodes = set()
+    edge_to_inst = {}
+
+    d_nodes = []
+    d_edges = []
+    d_conflicts = []
+
+    for year in sorted(year_to_edges.keys(), key=lambda x: int(x)):
+
+        for i in year_to_edges[year]:
+            s_code, t_code, e_year, institution = i
+
+            for code in (s_code, t_code):
+                if code not in seen_nodes:
+                    seen_nodes.add(code)
+                    d_nodes.append('\t'.join([code, nodes.get(code, '')]))
+
+            c_edge = '\t'.join([s_code, t_code, e_year])
+
+            if c_edge not in edge_to_inst:
+                edge_to_inst[c_edge] = institution
+                d_edges.append(c_edge)
+            elif edge_to_inst[c_edge] != institution:
+                d_conflicts.append('\t'.join([c_edge, edge_to_inst[c_edge], institution]))
+
+        if from_year is not None and int(year) < from_year:
+            continue
+
+        save(d_nodes, os.path.join(dir_output, 'nodes_delta_' + year + '.csv'), schema='nodes')
+        save([c + '\t' + edge_to_inst[c] for c in d_edges],
+             os.path.join(dir_output, 'edges_delta_' + year + '.csv'), schema='edges')
+        save(d_conflicts, os.path.join(dir_output, 'institutions_delta_' + year + '.csv'), schema='institution_conflicts')
+        d_years.append(year)
+
+        d_nodes = []
+        d_edges = []
+        d_conflicts = []
+
+    save(d_years, path_manifest)
+
+
+def replay_deltas(dir_deltas, until_year):
+    with open(os.path.join(dir_deltas, DELTA_MANIFEST_FILE), encoding='utf-8') as f:
+        years = [y for y in f.read().split() if int(y) <= int(until_year)]
+
+    c_nodes = []
+    c_edges = []
+
+    for year in sorted(years, key=lambda x: int(x)):
+        header, rows = read_rows(os.path.join(dir_deltas, 'nodes_delta_' + year + '.csv'), DELIMITER)
+        for row in rows:
+            c_nodes.append(DELIMITER.join(row))
+
+        header, rows = read_rows(os.path.join(dir_deltas, 'edges_delta_' + year + '.csv'), DELIMITER)
+        for row in rows:
+            c_edges.append(DELIMITER.join(row))
+
+    return c_nodes, c_edges
+
+
+def save_subgraphs(nodes, edges, params):
+    dir_output = make_output_dir(params.dir_output, params.per_run)
+
+    if params.delta:
+        print('Saving deltas')
+        save_deltas(nodes, edges, dir_output, params.from_year)
+        return
 
     print('Spliting edges according to its years')
     cumedges = split_edges(edges)
@@ -61,6 +186,9 @@ if __name__ == '__main__':
 
     print('Saving subgraphs')
     for c in cumedges:
+        if params.from_year is not None and int(cumedges[c][-1][2]) < params.from_year:
+            continue
+
         c_edges = []
         c_nodes = []
 
@@ -94,8 +222,25 @@ if __name__ == '__main__':
             if int(year) > c_year:
                 c_year = int(year)
 
-        save(c_nodes, 'nodes_' + str(c_year) + '.csv')
+        save(c_nodes, os.path.join(dir_output, 'nodes_' + str(c_year) + '.csv'), schema='nodes')
 
         for ind, c in enumerate(c_edges):
             c_edges[ind] = c + '\t' + edge_to_inst[c]
-        save(c_edges, 'edges_' + str(c_year) + '.csv')
+        save(c_edges, os.path.join(dir_output, 'edges_' + str(c_year) + '.csv'), schema='edges')
+
+
+def main(argv=None):
+    print('Reading nodes and edges')
+    edges, params = read_data(argv)
+
+    if params.file_nodes:
+        nodes_context = MappedNodes(params.file_nodes, delimiter=DELIMITER)
+    else:
+        nodes_context = nullcontext({})
+
+    with nodes_context as nodes:
+        save_subgraphs(nodes, edges, params)
+
+
+if __name__ == '__main__':
+    main()
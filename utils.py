@@ -1,48 +1,256 @@
 import csv
+import mmap
 import os
+import tempfile
+import time
+import uuid
+
+from contextlib import contextmanager
 
 
 NODE_CODE_COLUMN_HEADER = os.environ.get('NODE_CODE_COLUMN_HEADER', 'Id')
-NODE_LABEL_COLUMN_HEADER = os.environ.get('NODE_CODE_COLUMN_HEADER', 'Label')
+NODE_LABEL_COLUMN_HEADER = os.environ.get('NODE_LABEL_COLUMN_HEADER', 'Label')
 SOURCE_CODE_COLUMN_HEADER = os.environ.get('SOURCE_CODE_COLUMN_HEADER', 'Source')
 TARGET_CODE_COLUMN_HEADER = os.environ.get('TARGET_CODE_COLUMN_HEADER', 'Target')
 YEAR_COLUMN_HEADER = os.environ.get('YEAR_COLUMN_HEADER', 'Year')
 INSTITUTION_COLUMN_HEADER = os.environ.get('INSTITUTION_COLUMN_HEADER', 'Institution')
+DISCARDED_INSTITUTION_COLUMN_HEADER = os.environ.get('DISCARDED_INSTITUTION_COLUMN_HEADER', 'DiscardedInstitution')
+
+OFFSET_INDEX_EXTENSION = '.idx'
+OFFSET_INDEX_HEADER_MARKER = '#offsets'
+
+SCHEMAS = {
+    'nodes': [NODE_CODE_COLUMN_HEADER, NODE_LABEL_COLUMN_HEADER],
+    'edges': [SOURCE_CODE_COLUMN_HEADER, TARGET_CODE_COLUMN_HEADER, YEAR_COLUMN_HEADER, INSTITUTION_COLUMN_HEADER],
+    'institution_conflicts': [SOURCE_CODE_COLUMN_HEADER, TARGET_CODE_COLUMN_HEADER, YEAR_COLUMN_HEADER,
+                              INSTITUTION_COLUMN_HEADER, DISCARDED_INSTITUTION_COLUMN_HEADER],
+}
 
 
 def read_nodes(path_file_nodes, delimiter):
     nodes = {}
 
-    with open(path_file_nodes) as f:
-        csv_reader = csv.DictReader(f, delimiter=delimiter)
-        for i in csv_reader:
-            code = i.get(NODE_CODE_COLUMN_HEADER)
-            label = i.get(NODE_LABEL_COLUMN_HEADER)
+    header, rows = read_rows(path_file_nodes, delimiter)
+    code_col = _find_column(header, NODE_CODE_COLUMN_HEADER)
+    label_col = _find_column(header, NODE_LABEL_COLUMN_HEADER)
 
-            if code not in nodes:
-                nodes[code] = label
-            else:
-                print('Vértice duplicado %s' % code)
+    for row in rows:
+        code = _get_column(row, code_col)
+        label = _get_column(row, label_col)
+
+        if code not in nodes:
+            nodes[code] = label
+        else:
+            print('Vértice duplicado %s' % code)
 
     return nodes
 
 
-def read_edges(path_file_edges, delimiter):
+def read_edges(path_file_edges, delimiter, year_range=None, institutions=None):
     edges = []
 
-    with open(path_file_edges) as f:
-        csv_reader = csv.DictReader(f, delimiter=delimiter)
-        for i in csv_reader:
-            source = i.get(SOURCE_CODE_COLUMN_HEADER)
-            target = i.get(TARGET_CODE_COLUMN_HEADER)
-            year = i.get(YEAR_COLUMN_HEADER)
-            institution = i.get(INSTITUTION_COLUMN_HEADER)
+    with open(path_file_edges, encoding='utf-8', newline='') as f:
+        rows = csv.reader(f, delimiter=delimiter, quoting=csv.QUOTE_NONE)
+        header = next(rows, [])
+
+        source_col = _find_column(header, SOURCE_CODE_COLUMN_HEADER)
+        target_col = _find_column(header, TARGET_CODE_COLUMN_HEADER)
+        year_col = _find_column(header, YEAR_COLUMN_HEADER)
+        institution_col = _find_column(header, INSTITUTION_COLUMN_HEADER)
+
+        for row in rows:
+            if not row:
+                continue
+
+            year = _get_column(row, year_col)
+            if year_range is not None and not is_year_in_range(year, year_range):
+                continue
+
+            institution = _get_column(row, institution_col)
+            if institutions is not None and institution not in institutions:
+                continue
+
+            source = _get_column(row, source_col)
+            target = _get_column(row, target_col)
             edges.append((source, target, year, institution))
 
     return edges
 
 
-def split_edges(edges):
+def map_file(f):
+    if os.fstat(f.fileno()).st_size == 0:
+        return b''
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def iter_rows(mapped, delimiter, offset=0):
+    sep = delimiter.encode('utf-8')
+    size = len(mapped)
+
+    while offset < size:
+        end = mapped.find(b'\n', offset)
+        if end == -1:
+            end = size
+
+        line = mapped[offset:end].rstrip(b'\r')
+        if line:
+            yield offset, tuple(x.decode('utf-8') for x in line.split(sep))
+
+        offset = end + 1
+
+
+def read_rows(path_file, delimiter):
+    with open(path_file, 'rb') as f:
+        mapped = map_file(f)
+        try:
+            rows = iter_rows(mapped, delimiter)
+            header = next(rows, (0, ()))[1]
+            return header, [row for offset, row in rows]
+        finally:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+
+def read_row(mapped, delimiter, offset):
+    return next(iter_rows(mapped, delimiter, offset))[1]
+
+
+def _find_column(header, name):
+    if name in header:
+        return header.index(name)
+
+
+def _get_column(row, col):
+    if col is not None and col < len(row):
+        return row[col]
+
+
+def _offset_index_header(path_file):
+    stat = os.stat(path_file)
+    return '%s\t%d\t%d\n' % (OFFSET_INDEX_HEADER_MARKER, stat.st_size, stat.st_mtime_ns)
+
+
+def build_offset_index(path_file, delimiter, key_header):
+    index = {}
+    index_header = _offset_index_header(path_file)
+
+    with open(path_file, 'rb') as f:
+        rows = iter_rows(map_file(f), delimiter)
+        header = next(rows, (0, ()))[1]
+        key_col = _find_column(header, key_header)
+
+        for offset, row in rows:
+            key = _get_column(row, key_col)
+            if key not in index:
+                index[key] = offset
+            else:
+                print('Vértice duplicado %s' % key)
+
+    try:
+        with atomic_open(path_file + OFFSET_INDEX_EXTENSION) as f:
+            f.write(index_header)
+            for key, offset in index.items():
+                f.write('%s\t%d\n' % (key, offset))
+    except OSError as e:
+        print('Não foi possível gravar o índice de %s (%s); usando índice em memória' % (path_file, e))
+
+    return index
+
+
+def load_offset_index(path_file, delimiter, key_header):
+    path_index = path_file + OFFSET_INDEX_EXTENSION
+
+    if not os.path.exists(path_index):
+        return build_offset_index(path_file, delimiter, key_header)
+
+    index = {}
+    with open(path_index, encoding='utf-8') as f:
+        if f.readline() != _offset_index_header(path_file):
+            return build_offset_index(path_file, delimiter, key_header)
+
+        for line in f:
+            key, offset = line.rstrip('\n').rsplit('\t', 1)
+            index[key] = int(offset)
+
+    return index
+
+
+class MappedNodes:
+
+    def __init__(self, path_file_nodes, delimiter):
+        self.delimiter = delimiter
+        self.file = open(path_file_nodes, 'rb')
+        self.mapped = map_file(self.file)
+
+        header = next(iter_rows(self.mapped, delimiter), (0, ()))[1]
+        self.label_col = _find_column(header, NODE_LABEL_COLUMN_HEADER)
+
+        self.index = load_offset_index(path_file_nodes, delimiter, NODE_CODE_COLUMN_HEADER)
+        self.labels = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, code, default=None):
+        if code in self.labels:
+            return self.labels[code]
+
+        offset = self.index.get(code)
+        if offset is None:
+            return default
+
+        label = _get_column(read_row(self.mapped, self.delimiter, offset), self.label_col)
+        self.labels[code] = label
+        return label
+
+    def close(self):
+        if isinstance(self.mapped, mmap.mmap):
+            self.mapped.close()
+        self.file.close()
+
+
+def is_year_in_range(year, year_range):
+    if not year or not year.isdigit():
+        return False
+
+    year_start, year_end = year_range
+    if year_start is not None and int(year) < year_start:
+        return False
+    if year_end is not None and int(year) > year_end:
+        return False
+
+    return True
+
+
+def filter_edges_by_seeds(edges, seeds, radius):
+    neighbors = {}
+    for e in edges:
+        s, t, y, i = e
+        neighbors.setdefault(s, set()).add(t)
+        neighbors.setdefault(t, set()).add(s)
+
+    reached = set(seeds)
+    frontier = set(seeds)
+    for _ in range(radius):
+        next_frontier = set()
+        for code in frontier:
+            next_frontier.update(neighbors.get(code, set()) - reached)
+        reached.update(next_frontier)
+        frontier = next_frontier
+
+    return [e for e in edges if e[0] in reached and e[1] in reached]
+
+
+def group_edges_by_year(edges):
     year_to_edges = {}
     for e in edges:
         s, t, y, i = e
@@ -50,6 +258,12 @@ def split_edges(edges):
             year_to_edges[y] = []
         year_to_edges[y].append(e)
 
+    return year_to_edges
+
+
+def split_edges(edges):
+    year_to_edges = group_edges_by_year(edges)
+
     cumulative_year_to_edges = {}
     counter = 0
     for y in sorted(year_to_edges.keys(), key=lambda x: int(x)):
@@ -64,12 +278,53 @@ def split_edges(edges):
     return cumulative_year_to_edges
 
 
-def save(data, path):
-    with open(path, 'w') as f:
-        if 'nodes' in path:
-            f.write('Id\tLabel\n')
-        elif 'edges' in path:
-            f.write('Source\tTarget\tYear\tInstitution\n')
+@contextmanager
+def atomic_open(path, mode='w'):
+    path_tmp = '%s.%d.%s.tmp' % (path, os.getpid(), uuid.uuid4().hex[:8])
+    encoding = None if 'b' in mode else 'utf-8'
+
+    try:
+        with open(path_tmp, mode.replace('w', 'x'), encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path_tmp, path)
+    except BaseException:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+        raise
+
+
+def add_output_arguments(parser):
+    parser.add_argument(
+        '-o',
+        dest='dir_output',
+        default='.',
+        help='Diretório em que os arquivos de saída serão gravados'
+    )
+    parser.add_argument(
+        '--per-run',
+        dest='per_run',
+        action='store_true',
+        help='Grava a saída em um subdiretório exclusivo desta execução dentro do diretório de saída'
+    )
+
+
+def make_output_dir(dir_output='.', per_run=False):
+    os.makedirs(dir_output, exist_ok=True)
+
+    if per_run:
+        dir_output = tempfile.mkdtemp(prefix='run_%s_' % time.strftime('%Y%m%d%H%M%S'), dir=dir_output)
+        os.chmod(dir_output, 0o755)
+    print('Writing output to %s' % dir_output)
+
+    return dir_output
+
+
+def save(data, path, schema=None):
+    with atomic_open(path) as f:
+        if schema is not None:
+            f.write('\t'.join(SCHEMAS[schema]) + '\n')
 
         for d in data:
             f.write(d + '\n')